@@ -23,6 +23,69 @@ import warp as wp
 wp.init()
 
 
+@wp.kernel
+def integrate_all_steps_kernel(
+    particle_q: wp.array2d(dtype=wp.vec3),
+    particle_qd: wp.array2d(dtype=wp.vec3),
+    particle_inv_mass: wp.array(dtype=float),
+    spring_indices: wp.array(dtype=int),
+    spring_rest_lengths: wp.array(dtype=float),
+    spring_stiffness: wp.array(dtype=float),
+    spring_damping: wp.array(dtype=float),
+    gravity: wp.vec3,
+    dt: float,
+    step_count: int,
+):
+    """Kernel advancing the simulation over all its steps at once.
+
+    The state history is stored as a 2D array with one row per step,
+    so that a single launch, and hence a single tape node, covers the
+    full rollout instead of one integrator call per substep.
+    """
+    particle_count = particle_q.shape[1]
+    spring_count = spring_rest_lengths.shape[0]
+
+    for step in range(step_count):
+        for i in range(particle_count):
+            # Starting the accumulation from a fresh zero vector fuses what
+            # used to be a separate `clear_forces()` launch per substep into
+            # the step itself.
+            f = wp.vec3()
+
+            # Accumulate the forces from the springs attached to this particle.
+            for s in range(spring_count):
+                si = spring_indices[s * 2 + 0]
+                sj = spring_indices[s * 2 + 1]
+
+                if si == i or sj == i:
+                    ke = spring_stiffness[s]
+                    kd = spring_damping[s]
+                    rest = spring_rest_lengths[s]
+
+                    xij = particle_q[step, si] - particle_q[step, sj]
+                    vij = particle_qd[step, si] - particle_qd[step, sj]
+
+                    l = wp.length(xij)
+                    dir = xij / l
+
+                    c = l - rest
+                    dcdt = wp.dot(dir, vij)
+
+                    fs = dir * (ke * c + kd * dcdt)
+
+                    if si == i:
+                        f -= fs
+                    else:
+                        f += fs
+
+            # Semi-implicit Euler step, matching `warp.sim.SemiImplicitIntegrator`.
+            inv_mass = particle_inv_mass[i]
+            qd_new = particle_qd[step, i] + (f * inv_mass + gravity * wp.step(0.0 - inv_mass)) * dt
+
+            particle_q[step + 1, i] = particle_q[step, i] + qd_new * dt
+            particle_qd[step + 1, i] = qd_new
+
+
 @wp.kernel
 def compute_loss_kernel(
     pos: wp.array(dtype=wp.vec3),
@@ -33,14 +96,42 @@ def compute_loss_kernel(
 
 
 @wp.kernel(enable_backward=False)
-def apply_gradient_kernel(
+def apply_gradient_and_zero_kernel(
+    particle_q_grad: wp.array2d(dtype=wp.vec3),
+    particle_qd_grad: wp.array2d(dtype=wp.vec3),
+    particle_inv_mass_grad: wp.array(dtype=float),
     spring_rest_lengths_grad: wp.array(dtype=float),
+    spring_stiffness_grad: wp.array(dtype=float),
+    spring_damping_grad: wp.array(dtype=float),
+    loss_grad: wp.array(dtype=float),
     train_rate: float,
     spring_rest_lengths: wp.array(dtype=float),
 ):
-    tid = wp.tid()
+    """Kernel applying the gradient step and zeroing all the gradients.
+
+    The gradient application is only a handful of subtractions, so its
+    launch cost dwarfs its compute; it's folded into the gradient zeroing
+    pass run at the tail of each iteration, where `Tape.zero()` would
+    otherwise issue one zeroing operation per array. The per-spring work
+    piggybacks on the first row of threads, which assumes that the spring
+    count doesn't exceed the particle count.
+    """
+    step, i = wp.tid()
+
+    particle_q_grad[step, i] = wp.vec3()
+    particle_qd_grad[step, i] = wp.vec3()
 
-    spring_rest_lengths[tid] -= spring_rest_lengths_grad[tid] * train_rate
+    if step == 0:
+        particle_inv_mass_grad[i] = 0.0
+
+        if i < spring_rest_lengths_grad.shape[0]:
+            spring_rest_lengths[i] -= spring_rest_lengths_grad[i] * train_rate
+            spring_rest_lengths_grad[i] = 0.0
+            spring_stiffness_grad[i] = 0.0
+            spring_damping_grad[i] = 0.0
+
+        if i == 0:
+            loss_grad[0] = 0.0
 
 
 class Example:
@@ -64,6 +155,9 @@ class Example:
         # Number of simulation steps to take per frame.
         self.sim_substep_count = 1
 
+        # Total number of simulation steps.
+        self.sim_step_count = self.frame_count * self.sim_substep_count
+
         # Delta time between each simulation substep.
         self.sim_dt = 1.0 / (self.fps * self.sim_substep_count)
 
@@ -110,65 +204,156 @@ class Example:
         self.model.gravity = np.array((0.0, 0.0, 0.0))
         self.model.ground = False
 
-        # Use the Euler integrator for stepping through the simulation.
-        self.integrator = warp.sim.SemiImplicitIntegrator()
-
-        # Initialize a state for each simulation step.
-        self.states = tuple(
-            self.model.state(requires_grad=True) for _ in range(self.frame_count * self.sim_substep_count + 1)
+        # Store the particle states for all the simulation steps as stacked
+        # arrays with one row per step, so that the whole rollout can be
+        # advanced with a single kernel launch and recorded as a single node
+        # onto the tape, instead of issuing a couple of launches per substep.
+        self.particle_q = wp.zeros(
+            (self.sim_step_count + 1, self.model.particle_count),
+            dtype=wp.vec3,
+            requires_grad=True,
+        )
+        self.particle_qd = wp.zeros(
+            (self.sim_step_count + 1, self.model.particle_count),
+            dtype=wp.vec3,
+            requires_grad=True,
         )
 
+        # Set the initial state, which is never overwritten by the kernel.
+        wp.copy(self.particle_q[0], self.model.particle_q)
+        wp.copy(self.particle_qd[0], self.model.particle_qd)
+
+        # View onto the positions of the final simulation step, used to
+        # evaluate the loss.
+        self.last_particle_q = self.particle_q[self.sim_step_count]
+
         # Initialize a loss value that will represent the distance of the main
         # particle to the target position. It needs to be defined as an array
         # so that it can be written out by a kernel.
         self.loss = wp.zeros(1, dtype=float, requires_grad=True)
 
+        # History of the loss values, recorded on device after each training
+        # iteration so that they can be read back in a single transfer at the
+        # end of the training instead of syncing on every iteration.
+        self.loss_history = wp.zeros(self.train_iters, dtype=float)
+
         if enable_rendering:
             import warp.sim.render
 
             # Helper to render the physics scene as a USD file.
             self.renderer = warp.sim.render.SimRenderer(self.model, stage, fps=self.fps)
 
+            # Single state reused to pass the particle positions of each
+            # rendered frame onto the renderer. Its position array is rebound
+            # to a row of the position history, which avoids both allocating
+            # one state per frame and copying any data around.
+            self.render_state = self.model.state()
+
             # Allows rendering one simulation to USD every N training iterations.
             self.render_iteration_steps = 2
 
+            # Device-side snapshots of the position history for the iterations
+            # to be rendered. They are recorded during training with async
+            # copies and are written out to USD only once training is done,
+            # so that the USD writer's host syncs don't stall the hot loop.
+            snapshot_count = sum(
+                1
+                for iteration in range(self.train_iters)
+                if iteration == self.train_iters - 1 or iteration % self.render_iteration_steps == 0
+            )
+            self.render_snapshots = tuple(wp.empty_like(self.particle_q) for _ in range(snapshot_count))
+
             # Frame number used to render the simulation iterations onto the USD file.
             self.render_frame = 0
         else:
             self.renderer = None
 
-        use_cuda_graph = True
+        self.verbose = verbose
+
+        use_cuda_graph = wp.get_device().is_cuda
         if use_cuda_graph:
-            # Capture all the kernel launches into a CUDA graph so that they can
-            # all be run in a single graph launch, which helps with performance.
+            # Run a first training step eagerly as a warm-up, so that the
+            # modules are loaded and the scratch gradient buffers needed by
+            # the backward pass are allocated before capturing begins, since
+            # no allocation is allowed while a graph is being captured.
+            spring_rest_lengths = self.model.spring_rest_length.numpy()
+            self.simulate()
+
+            # Ensure that nothing from the warm-up step, including any
+            # pending allocator work, is still in flight before capturing.
+            wp.synchronize_device()
+
+            # Capture the whole training step, that is the forward pass,
+            # the backward tape traversal, and the gradient application,
+            # into a single CUDA graph so that each iteration can be run
+            # with a single graph launch, which helps with performance.
+            # Capture requires all the array shapes to be fixed and allows
+            # no allocation and no host-side sync within the captured
+            # region, which the warm-up step above guarantees by forcing
+            # every internal allocation to happen up front.
             wp.capture_begin()
             try:
                 self.simulate()
             finally:
                 self.graph = wp.capture_end()
+
+            # Graphs aren't a universal win: for very small workloads like
+            # this one, the cost of copying the kernel parameters at each
+            # graph replay can outweigh the launch overhead being saved.
+            # Time a few iterations of both paths and keep the faster one.
+            benchmark_iters = 3
+
+            with wp.ScopedTimer("eager", print=False, synchronize=True) as timer:
+                for _ in range(benchmark_iters):
+                    self.simulate()
+            eager_time = timer.elapsed
+
+            with wp.ScopedTimer("graph", print=False, synchronize=True) as timer:
+                for _ in range(benchmark_iters):
+                    wp.capture_launch(self.graph)
+            graph_time = timer.elapsed
+
+            if eager_time <= graph_time * 1.1:
+                self.graph = None
+
+            if self.verbose:
+                path = "eager" if self.graph is None else "graph"
+                print(
+                    f"benchmarked eager={eager_time:.3f}ms vs "
+                    f"graph={graph_time:.3f}ms over {benchmark_iters} "
+                    f"iterations, using the {path} path"
+                )
+
+            # Undo the side effects of the warm-up and benchmark steps so
+            # that the training starts from a clean state.
+            self.model.spring_rest_length.assign(spring_rest_lengths)
         else:
             self.graph = None
 
-        self.verbose = verbose
-
     def compute_loss(self) -> None:
-        for i in range(1, len(self.states)):
-            prev = self.states[i - 1]
-            curr = self.states[i]
-            prev.clear_forces()
-            self.integrator.simulate(
-                self.model,
-                prev,
-                curr,
+        wp.launch(
+            integrate_all_steps_kernel,
+            dim=1,
+            inputs=(
+                self.particle_q,
+                self.particle_qd,
+                self.model.particle_inv_mass,
+                self.model.spring_indices,
+                self.model.spring_rest_length,
+                self.model.spring_stiffness,
+                self.model.spring_damping,
+                wp.vec3(*self.model.gravity),
                 self.sim_dt,
-            )
+                self.sim_step_count,
+            ),
+            outputs=(),
+        )
 
-        last_state = self.states[-1]
         wp.launch(
             compute_loss_kernel,
             dim=1,
             inputs=(
-                last_state.particle_q,
+                self.last_particle_q,
                 self.target_pos,
             ),
             outputs=(self.loss,),
@@ -181,28 +366,38 @@ class Example:
 
         tape.backward(loss=self.loss)
 
+        # Apply the gradient step and zero all the gradients for the next
+        # iteration in a single fused launch, rather than one tiny launch
+        # for the update plus one zeroing operation per gradient array.
         wp.launch(
-            apply_gradient_kernel,
-            dim=self.model.spring_count,
+            apply_gradient_and_zero_kernel,
+            dim=self.particle_q.shape,
             inputs=(
+                self.particle_q.grad,
+                self.particle_qd.grad,
+                self.model.particle_inv_mass.grad,
                 self.model.spring_rest_length.grad,
+                self.model.spring_stiffness.grad,
+                self.model.spring_damping.grad,
+                self.loss.grad,
                 self.train_rate,
             ),
             outputs=(self.model.spring_rest_length,),
         )
 
-        tape.zero()
-
     def update(self):
         if self.graph is None:
             self.simulate()
         else:
             wp.capture_launch(self.graph)
 
-    def render(self):
+    def render(self, particle_q=None):
         if self.renderer is None:
             return
 
+        if particle_q is None:
+            particle_q = self.particle_q
+
         self.renderer.begin_frame(0.0)
         self.renderer.render_box(
             name="target",
@@ -213,26 +408,43 @@ class Example:
         self.renderer.end_frame()
 
         for frame in range(self.frame_count):
+            self.render_state.particle_q = particle_q[frame * self.sim_substep_count]
+
             self.renderer.begin_frame(self.render_frame / self.fps)
-            self.renderer.render(self.states[frame * self.sim_substep_count])
+            self.renderer.render(self.render_state)
             self.renderer.end_frame()
 
             self.render_frame += 1
 
     def run(self) -> None:
+        snapshot_count = 0
         for iteration in range(self.train_iters):
             self.update()
 
-            loss = self.loss.numpy()[0]
-
-            if self.verbose:
-                print(f"[{iteration:3d}] loss={loss:.8f}")
+            # Record the loss for this iteration on device. Reading its value
+            # back here would force a sync that stalls the CPU from scheduling
+            # the next iteration.
+            wp.copy(self.loss_history, self.loss, dest_offset=iteration)
 
-            if (
+            if self.renderer is not None and (
                 iteration == self.train_iters - 1
                 or iteration % self.render_iteration_steps == 0
             ):
-                self.render()
+                # Snapshot the history of this iteration with an async
+                # device-to-device copy; writing it out to USD here would
+                # sync on the particle data and serialize training with
+                # rendering.
+                wp.copy(self.render_snapshots[snapshot_count], self.particle_q)
+                snapshot_count += 1
+
+        # Write the recorded iterations out to USD now that training is done.
+        for i in range(snapshot_count):
+            self.render(self.render_snapshots[i])
+
+        if self.verbose:
+            # Read the whole loss history back in a single transfer.
+            for iteration, loss in enumerate(self.loss_history.numpy()):
+                print(f"[{iteration:3d}] loss={loss:.8f}")
 
         if self.renderer is not None:
             self.renderer.save()
@@ -9,6 +9,7 @@
 
 import traceback
 
+import numpy as np
 import omni.graph.core as og
 import warp as wp
 
@@ -37,6 +38,166 @@ UP_AXIS_MAPPING = {
 }
 
 
+#   Helpers
+# -----------------------------------------------------------------------------
+
+
+# Primes used to hash the lattice coordinates, matching the built-in noise
+# implementation from `warp/native/noise.h`.
+HASH_PRIME_X = wp.constant(wp.uint32(73856093))
+HASH_PRIME_Y = wp.constant(wp.uint32(19349663))
+HASH_PRIME_Z = wp.constant(wp.uint32(53471161))
+HASH_PRIME_T = wp.constant(wp.uint32(10000019))
+
+
+@wp.func
+def smootherstep(t: float) -> float:
+    return t * t * t * (t * (t * 6.0 - 15.0) + 10.0)
+
+
+@wp.func
+def interpolate(a0: float, a1: float, t: float) -> float:
+    return (a1 - a0) * smootherstep(t) + a0
+
+
+@wp.func
+def dot_grid_gradient_4d(
+    idx: wp.uint32,
+    dx: float,
+    dy: float,
+    dz: float,
+    dt: float,
+) -> float:
+    state = idx
+    gx = wp.randf(state) - 0.5
+    gy = wp.randf(state) - 0.5
+    gz = wp.randf(state) - 0.5
+    gt = wp.randf(state) - 0.5
+    gradient = wp.normalize(wp.vec4(gx, gy, gz, gt))
+    return dx * gradient[0] + dy * gradient[1] + dz * gradient[2] + dt * gradient[3]
+
+
+@wp.func
+def noise_4d_slice(
+    h000: wp.uint32,
+    h100: wp.uint32,
+    h010: wp.uint32,
+    h110: wp.uint32,
+    h001: wp.uint32,
+    h101: wp.uint32,
+    h011: wp.uint32,
+    h111: wp.uint32,
+    dx: float,
+    dy: float,
+    dz: float,
+    state: wp.uint32,
+    t: float,
+) -> float:
+    """Evaluates one w-slice of the 4D Perlin noise.
+
+    The hashes of the spatial corners of the lattice cell are expected
+    to be precomputed, so that they can be shared across slices.
+    """
+    it0 = int(wp.floor(t))
+    dt = t - wp.floor(t)
+
+    key0 = wp.uint32(it0) * HASH_PRIME_T + state
+    key1 = wp.uint32(it0 + 1) * HASH_PRIME_T + state
+
+    v0000 = dot_grid_gradient_4d(h000 ^ key0, dx, dy, dz, dt)
+    v1000 = dot_grid_gradient_4d(h100 ^ key0, dx - 1.0, dy, dz, dt)
+    xi000 = interpolate(v0000, v1000, dx)
+
+    v0100 = dot_grid_gradient_4d(h010 ^ key0, dx, dy - 1.0, dz, dt)
+    v1100 = dot_grid_gradient_4d(h110 ^ key0, dx - 1.0, dy - 1.0, dz, dt)
+    xi100 = interpolate(v0100, v1100, dx)
+
+    yi00 = interpolate(xi000, xi100, dy)
+
+    v0010 = dot_grid_gradient_4d(h001 ^ key0, dx, dy, dz - 1.0, dt)
+    v1010 = dot_grid_gradient_4d(h101 ^ key0, dx - 1.0, dy, dz - 1.0, dt)
+    xi010 = interpolate(v0010, v1010, dx)
+
+    v0110 = dot_grid_gradient_4d(h011 ^ key0, dx, dy - 1.0, dz - 1.0, dt)
+    v1110 = dot_grid_gradient_4d(h111 ^ key0, dx - 1.0, dy - 1.0, dz - 1.0, dt)
+    xi110 = interpolate(v0110, v1110, dx)
+
+    yi10 = interpolate(xi010, xi110, dy)
+
+    zi0 = interpolate(yi00, yi10, dz)
+
+    v0001 = dot_grid_gradient_4d(h000 ^ key1, dx, dy, dz, dt - 1.0)
+    v1001 = dot_grid_gradient_4d(h100 ^ key1, dx - 1.0, dy, dz, dt - 1.0)
+    xi001 = interpolate(v0001, v1001, dx)
+
+    v0101 = dot_grid_gradient_4d(h010 ^ key1, dx, dy - 1.0, dz, dt - 1.0)
+    v1101 = dot_grid_gradient_4d(h110 ^ key1, dx - 1.0, dy - 1.0, dz, dt - 1.0)
+    xi101 = interpolate(v0101, v1101, dx)
+
+    yi01 = interpolate(xi001, xi101, dy)
+
+    v0011 = dot_grid_gradient_4d(h001 ^ key1, dx, dy, dz - 1.0, dt - 1.0)
+    v1011 = dot_grid_gradient_4d(h101 ^ key1, dx - 1.0, dy, dz - 1.0, dt - 1.0)
+    xi011 = interpolate(v0011, v1011, dx)
+
+    v0111 = dot_grid_gradient_4d(h011 ^ key1, dx, dy - 1.0, dz - 1.0, dt - 1.0)
+    v1111 = dot_grid_gradient_4d(h111 ^ key1, dx - 1.0, dy - 1.0, dz - 1.0, dt - 1.0)
+    xi111 = interpolate(v0111, v1111, dx)
+
+    yi11 = interpolate(xi011, xi111, dy)
+
+    zi1 = interpolate(yi01, yi11, dz)
+
+    return interpolate(zi0, zi1, dt)
+
+
+@wp.func
+def perlin_noise_vec3(
+    state: wp.uint32,
+    xyz: wp.vec3,
+    t0: float,
+    t1: float,
+    t2: float,
+) -> wp.vec3:
+    """Evaluates three w-slices of the 4D Perlin noise at once.
+
+    Calling the built-in `wp.noise()` three times recomputes the hash of
+    the spatial corners of the lattice cell containing `xyz` for each
+    call, when only the 4th coordinate differs between them. Computing
+    the spatial hashes once and evaluating the three slices against them
+    cuts that redundant work.
+    """
+    ix0 = int(wp.floor(xyz[0]))
+    iy0 = int(wp.floor(xyz[1]))
+    iz0 = int(wp.floor(xyz[2]))
+
+    dx = xyz[0] - wp.floor(xyz[0])
+    dy = xyz[1] - wp.floor(xyz[1])
+    dz = xyz[2] - wp.floor(xyz[2])
+
+    hx0 = wp.uint32(ix0) * HASH_PRIME_X
+    hx1 = wp.uint32(ix0 + 1) * HASH_PRIME_X
+    hy0 = wp.uint32(iy0) * HASH_PRIME_Y
+    hy1 = wp.uint32(iy0 + 1) * HASH_PRIME_Y
+    hz0 = wp.uint32(iz0) * HASH_PRIME_Z
+    hz1 = wp.uint32(iz0 + 1) * HASH_PRIME_Z
+
+    h000 = hx0 ^ hy0 ^ hz0
+    h100 = hx1 ^ hy0 ^ hz0
+    h010 = hx0 ^ hy1 ^ hz0
+    h110 = hx1 ^ hy1 ^ hz0
+    h001 = hx0 ^ hy0 ^ hz1
+    h101 = hx1 ^ hy0 ^ hz1
+    h011 = hx0 ^ hy1 ^ hz1
+    h111 = hx1 ^ hy1 ^ hz1
+
+    return wp.vec3(
+        noise_4d_slice(h000, h100, h010, h110, h001, h101, h011, h111, dx, dy, dz, state, t0),
+        noise_4d_slice(h000, h100, h010, h110, h001, h101, h011, h111, dx, dy, dz, state, t1),
+        noise_4d_slice(h000, h100, h010, h110, h001, h101, h011, h111, dx, dy, dz, state, t2),
+    )
+
+
 #   Kernels
 # -----------------------------------------------------------------------------
 
@@ -44,56 +205,34 @@ UP_AXIS_MAPPING = {
 @wp.kernel(enable_backward=False)
 def deform_noise_kernel(
     points: wp.array(dtype=wp.vec3),
+    point_to_prim: wp.array(dtype=int),
+    seeds: wp.array(dtype=int),
     partial: bool,
     axis: int,
     axis_sign: float,
     falloff_begin: float,
-    falloff_end: float,
     falloff: float,
     func: int,
     cell_size: float,
     offset: float,
     amplitude: wp.vec3,
-    seed: wp.uint32,
     out_points: wp.array(dtype=wp.vec3),
 ):
     """Kernel to deform points using a noise."""
     tid = wp.tid()
 
-    seed = wp.rand_init(int(seed))
+    seed = wp.rand_init(seeds[point_to_prim[tid]])
 
     pos = points[tid]
     noise_pos = wp.vec3(pos / cell_size)
 
     if func == FUNC_PERLIN:
-        displacement = wp.vec3(
-            wp.noise(
-                seed,
-                wp.vec4(
-                    noise_pos[0],
-                    noise_pos[1],
-                    noise_pos[2],
-                    offset,
-                ),
-            ),
-            wp.noise(
-                seed,
-                wp.vec4(
-                    noise_pos[0],
-                    noise_pos[1],
-                    noise_pos[2],
-                    offset + 1234.5,
-                ),
-            ),
-            wp.noise(
-                seed,
-                wp.vec4(
-                    noise_pos[0],
-                    noise_pos[1],
-                    noise_pos[2],
-                    offset + 6789.0,
-                ),
-            ),
+        displacement = perlin_noise_vec3(
+            seed,
+            noise_pos,
+            offset,
+            offset + 1234.5,
+            offset + 6789.0,
         )
     elif func == FUNC_CURL:
         displacement = wp.curlnoise(
@@ -106,21 +245,13 @@ def deform_noise_kernel(
             ),
         )
 
-    if partial:
-        if falloff < 1e-3:
-            if (pos[axis] - falloff_begin) * axis_sign > 0:
-                influence = 1.0
-            else:
-                influence = 0.0
-        else:
-            if axis_sign < 0.0:
-                dist = wp.clamp(pos[axis], falloff_end, falloff_begin)
-            else:
-                dist = wp.clamp(pos[axis], falloff_begin, falloff_end)
-
-            influence = axis_sign * (dist - falloff_begin) / falloff
-    else:
-        influence = 1.0
+    # Branchless evaluation of the falloff influence, to avoid divergence
+    # between the threads of a same warp straddling the falloff boundary.
+    # Clamping the denominator makes a degenerate falloff collapse to the
+    # same 0/1 step around the boundary as an explicit comparison would.
+    denom = wp.max(falloff, 1e-3)
+    raw = axis_sign * (pos[axis] - falloff_begin) / denom
+    influence = wp.select(partial, 1.0, wp.clamp(raw, 0.0, 1.0))
 
     displacement[0] *= amplitude[0] * influence
     displacement[1] *= amplitude[1] * influence
@@ -128,6 +259,22 @@ def deform_noise_kernel(
     out_points[tid] = pos + displacement
 
 
+#   Internal State
+# ------------------------------------------------------------------------------
+
+
+class InternalState:
+    """Internal state for the node."""
+
+    def __init__(self) -> None:
+        self.points_concat = None
+        self.point_to_prim = None
+        self.seeds = None
+
+        self.point_counts = None
+        self.seed = None
+
+
 #   Compute
 # ------------------------------------------------------------------------------
 
@@ -137,46 +284,106 @@ def compute(db: OgnNoiseDeformDatabase) -> None:
     # Copy the input primitives bundle.
     db.outputs.prims = db.inputs.prims
 
+    # Cache the input attributes into locals, since each `db.inputs.*`
+    # access goes through the OGN attribute machinery and can cost on the
+    # same order as a kernel launch.
+    in_prims = db.inputs.prims
+    out_prims = db.outputs.prims
+    falloff = db.inputs.falloff
+    cell_size = db.inputs.cellSize
+    input_seed = db.inputs.seed
+
     partial = db.inputs.mode == "partial"
     func = FUNC_MAPPING[db.inputs.func]
     (axis, axis_sign) = UP_AXIS_MAPPING[db.inputs.upAxis]
     falloff_begin = db.inputs.base * axis_sign
-    falloff_end = (db.inputs.base + db.inputs.falloff) * axis_sign
     time_offset = db.inputs.time * db.inputs.speed
     amplitude = db.inputs.axisAmplitude * db.inputs.amplitude
 
-    prim_count = omni.warp.nodes.bundle_get_child_count(db.inputs.prims)
-    for i in range(prim_count):
-        # Retrieve the input and output point data.
-        in_points = omni.warp.nodes.mesh_get_points(
-            db.inputs.prims,
+    prim_count = omni.warp.nodes.bundle_get_child_count(in_prims)
+    if prim_count == 0:
+        return
+
+    # Retrieve the input and output point data.
+    in_points = tuple(
+        omni.warp.nodes.mesh_get_points(
+            in_prims,
             child_idx=i,
         )
-        out_points = omni.warp.nodes.mesh_get_points(
-            db.outputs.prims,
+        for i in range(prim_count)
+    )
+    out_points = tuple(
+        omni.warp.nodes.mesh_get_points(
+            out_prims,
             child_idx=i,
         )
-
-        # Evaluate the kernel once per point.
-        wp.launch(
-            deform_noise_kernel,
-            dim=len(in_points),
-            inputs=(
-                in_points,
-                partial,
-                axis,
-                axis_sign,
-                falloff_begin,
-                falloff_end,
-                db.inputs.falloff,
-                func,
-                db.inputs.cellSize,
-                time_offset,
-                amplitude,
-                db.inputs.seed + i * 1234,
-            ),
-            outputs=(out_points,),
+        for i in range(prim_count)
+    )
+
+    point_counts = tuple(len(x) for x in in_points)
+    total_point_count = sum(point_counts)
+
+    state = db.internal_state
+
+    # (Re)allocate the staging buffers and the point-to-prim mapping only
+    # when the prim layout changes, so that repeated evaluations reuse the
+    # same device allocations.
+    if state.point_counts != point_counts:
+        state.points_concat = wp.empty(total_point_count, dtype=wp.vec3)
+        state.point_to_prim = wp.array(
+            np.repeat(np.arange(prim_count), point_counts),
+            dtype=int,
         )
+        state.point_counts = point_counts
+        state.seed = None
+
+    # Refresh the device-resident seed table with a single small copy when
+    # the seed input changes, rather than rebuilding it on every evaluation.
+    if state.seed != input_seed:
+        if state.seeds is None or len(state.seeds) != prim_count:
+            state.seeds = wp.empty(prim_count, dtype=int)
+
+        state.seeds.assign(np.arange(prim_count, dtype=np.int32) * 1234 + input_seed)
+        state.seed = input_seed
+
+    # Concatenate the point data of all the prims into the staging buffer
+    # so that a single kernel launch can cover all of them, instead of
+    # paying one launch overhead per prim. The buffer is deformed in-place,
+    # each thread reading its point before writing it back, which halves
+    # the staging footprint and memory traffic. USD mesh points are always
+    # stored as `point3f`, so a half-precision output isn't expressible.
+    points_concat = state.points_concat
+    offset = 0
+    for points in in_points:
+        wp.copy(points_concat, points, dest_offset=offset)
+        offset += len(points)
+
+    # Evaluate the kernel once per point, over all the prims at once.
+    wp.launch(
+        deform_noise_kernel,
+        dim=total_point_count,
+        inputs=(
+            points_concat,
+            state.point_to_prim,
+            state.seeds,
+            partial,
+            axis,
+            axis_sign,
+            falloff_begin,
+            falloff,
+            func,
+            cell_size,
+            time_offset,
+            amplitude,
+        ),
+        outputs=(points_concat,),
+    )
+
+    # Scatter the deformed points back onto each prim.
+    offset = 0
+    for points in out_points:
+        wp.copy(points, points_concat, src_offset=offset, count=len(points))
+        offset += len(points)
 
 
 #   Node Entry Point
@@ -186,6 +393,10 @@ def compute(db: OgnNoiseDeformDatabase) -> None:
 class OgnNoiseDeform:
     """Node."""
 
+    @staticmethod
+    def internal_state() -> InternalState:
+        return InternalState()
+
     @staticmethod
     def compute(db: OgnNoiseDeformDatabase) -> None:
         device = wp.get_device("cuda:0")
@@ -1,10 +1,14 @@
 import unittest
 
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
 import numpy as np
 import warp as wp
 import unittest
 
-from warp.optim.linear import preconditioner, cg, bicgstab, gmres
+from warp.optim.linear import aslinearoperator, preconditioner, cg, bicgstab, gmres
+from warp.utils import array_inner
 from warp.tests.unittest_utils import *
 
 
@@ -12,10 +16,16 @@ wp.init()
 
 
 def _check_linear_solve(test, A, b, func, *args, **kwargs):
+    # Note on CUDA graphs: each solver call with `use_cuda_graph=True`
+    # captures its iteration loop internally, against the scratch buffers it
+    # allocates for that call. A captured graph bakes in the addresses of
+    # those buffers, so it cannot be cached and replayed across calls without
+    # the solver also reusing its scratch allocations; the capture cost is
+    # paid once per call and amortized over the solver iterations.
     # test from zero
     x = wp.zeros_like(b)
     with wp.ScopedDevice(A.device):
-        niter, err, atol = func(A, b, x, *args, use_cuda_graph=True, **kwargs)
+        niter, err, atol = func(A, b, x, *args, use_cuda_graph=A.device.is_cuda, **kwargs)
 
     test.assertLessEqual(err, atol)
 
@@ -29,17 +39,30 @@ def _check_linear_solve(test, A, b, func, *args, **kwargs):
     # In CG and BiCGSTAB residual norm is evaluating from running residual
     # rather then being computed from scratch as Ax - b
     # This can lead to accumulated inaccuracies over iterations, esp in float32
-    residual = A.numpy() @ x.numpy() - b.numpy()
-    err_np = np.linalg.norm(residual)
+    # Recompute it on device, where the system already lives, so that only the
+    # squared norm scalar is read back.
+    r = wp.empty_like(b)
+    with wp.ScopedDevice(A.device):
+        aslinearoperator(A).matvec(x, b, r, alpha=1.0, beta=-1.0)
+    err_np = np.sqrt(array_inner(r, r))
     if A.dtype == wp.float64:
         test.assertLessEqual(err_np, 2.0 * atol)
     else:
         test.assertLessEqual(err_np, 32.0 * atol)
 
 
-def _least_square_system(rng, n: int):
-    C = rng.uniform(low=-100, high=100, size=(n, n))
-    f = rng.uniform(low=-100, high=100, size=(n,))
+@wp.kernel
+def _scale_columns_kernel(mat: wp.array2d(dtype=Any), scale: wp.array(dtype=Any)):
+    i, j = wp.tid()
+    mat[i, j] = mat[i, j] * scale[j]
+
+
+def _least_square_system(rng, n: int, dtype=np.float64):
+    # Generate directly at the target precision so that the matrix products
+    # run at the narrower width rather than computing everything in float64
+    # only to cast the results down.
+    C = rng.uniform(low=-100, high=100, size=(n, n)).astype(dtype, copy=False)
+    f = rng.uniform(low=-100, high=100, size=(n,)).astype(dtype, copy=False)
 
     A = C @ C.T
     b = C @ f
@@ -47,19 +70,52 @@ def _least_square_system(rng, n: int):
     return A, b
 
 
+def _least_square_system_device(rng, n: int, dtype, device):
+    # Assemble the system on device so that only the random generator outputs
+    # cross over to the GPU, rather than running the matrix products serially
+    # in NumPy on host and uploading the results.
+    np_dtype = wp.types.warp_type_to_np_dtype[dtype]
+    C = wp.array(rng.uniform(low=-100, high=100, size=(n, n)).astype(np_dtype, copy=False), dtype=dtype, device=device)
+    f = wp.array(rng.uniform(low=-100, high=100, size=(n, 1)).astype(np_dtype, copy=False), dtype=dtype, device=device)
+
+    A = wp.zeros((n, n), dtype=dtype, device=device)
+    b = wp.zeros((n, 1), dtype=dtype, device=device)
+
+    wp.matmul(C, C.transpose(), A, A, device=device)
+    wp.matmul(C, f, b, b, device=device)
+
+    return A, b.reshape((n,))
+
+
 def _make_spd_system(n: int, seed: int, dtype, device):
     rng = np.random.default_rng(seed)
+    device = wp.get_device(device)
 
-    A, b = _least_square_system(rng, n)
+    if device.is_cuda:
+        return _least_square_system_device(rng, n, dtype, device)
+
+    A, b = _least_square_system(rng, n, dtype=wp.types.warp_type_to_np_dtype[dtype])
 
     return wp.array(A, dtype=dtype, device=device), wp.array(b, dtype=dtype, device=device)
 
 
 def _make_nonsymmetric_system(n: int, seed: int, dtype, device, spd=False):
     rng = np.random.default_rng(seed)
-    s = rng.uniform(low=0.1, high=10, size=(n,))
-
-    A, b = _least_square_system(rng, n)
+    device = wp.get_device(device)
+    np_dtype = wp.types.warp_type_to_np_dtype[dtype]
+    s = rng.uniform(low=0.1, high=10, size=(n,)).astype(np_dtype, copy=False)
+
+    if device.is_cuda:
+        A, b = _least_square_system_device(rng, n, dtype, device)
+        wp.launch(
+            _scale_columns_kernel,
+            dim=A.shape,
+            device=device,
+            inputs=[A, wp.array(s, dtype=dtype, device=device)],
+        )
+        return A, b
+
+    A, b = _least_square_system(rng, n, dtype=np_dtype)
     A = A @ np.diag(s)
 
     return wp.array(A, dtype=dtype, device=device), wp.array(b, dtype=dtype, device=device)
@@ -67,65 +123,92 @@ def _make_nonsymmetric_system(n: int, seed: int, dtype, device, spd=False):
 
 def _make_indefinite_system(n: int, seed: int, dtype, device, spd=False):
     rng = np.random.default_rng(seed)
-    s = rng.uniform(low=0.1, high=10, size=(n,))
-
-    A, b = _least_square_system(rng, n)
+    device = wp.get_device(device)
+    np_dtype = wp.types.warp_type_to_np_dtype[dtype]
+    s = rng.uniform(low=0.1, high=10, size=(n,)).astype(np_dtype, copy=False)
+
+    if device.is_cuda:
+        A, b = _least_square_system_device(rng, n, dtype, device)
+        wp.launch(
+            _scale_columns_kernel,
+            dim=A.shape,
+            device=device,
+            inputs=[A, wp.array(s, dtype=dtype, device=device)],
+        )
+        return A, b
+
+    A, b = _least_square_system(rng, n, dtype=np_dtype)
     A = A @ np.diag(s)
 
     return wp.array(A, dtype=dtype, device=device), wp.array(b, dtype=dtype, device=device)
 
 
-def test_cg(test, device):
-    A, b = _make_spd_system(n=64, seed=123, device=device, dtype=wp.float64)
-    M = preconditioner(A, "diag")
-
-    _check_linear_solve(test, A, b, cg, maxiter=1000)
-    _check_linear_solve(test, A, b, cg, M=M, maxiter=1000)
+def _build_systems(device, requests):
+    # On CPU the build helpers are pure NumPy and release the GIL, so
+    # submitting them to a thread pool overlaps the setup of the later
+    # systems with the earlier solves. On CUDA they issue Warp allocations,
+    # launches and matmuls, and the Warp runtime does no locking around
+    # kernel instantiation, so build them on the calling thread instead.
+    # Each system seeds its own generator, so determinism is unaffected.
+    if wp.get_device(device).is_cuda:
+        for func, kwargs in requests:
+            yield func(device=device, **kwargs)
+    else:
+        with ThreadPoolExecutor() as executor:
+            futures = [executor.submit(func, device=device, **kwargs) for func, kwargs in requests]
+            for future in futures:
+                yield future.result()
 
-    A, b = _make_spd_system(n=16, seed=321, device=device, dtype=wp.float32)
-    M = preconditioner(A, "diag")
 
-    _check_linear_solve(test, A, b, cg, maxiter=1000)
-    _check_linear_solve(test, A, b, cg, M=M, maxiter=1000)
+def test_cg(test, device):
+    systems = _build_systems(
+        device,
+        (
+            (_make_spd_system, dict(n=64, seed=123, dtype=wp.float64)),
+            (_make_spd_system, dict(n=16, seed=321, dtype=wp.float32)),
+        ),
+    )
 
+    for A, b in systems:
+        M = preconditioner(A, "diag")
 
-def test_bicgstab(test, device):
-    A, b = _make_nonsymmetric_system(n=64, seed=123, device=device, dtype=wp.float64)
-    M = preconditioner(A, "diag")
+        _check_linear_solve(test, A, b, cg, maxiter=1000)
+        _check_linear_solve(test, A, b, cg, M=M, maxiter=1000)
 
-    _check_linear_solve(test, A, b, bicgstab, maxiter=1000)
-    _check_linear_solve(test, A, b, bicgstab, M=M, maxiter=1000)
-    _check_linear_solve(test, A, b, bicgstab, M=M, maxiter=1000, is_left_preconditioner=True)
 
-    A, b = _make_nonsymmetric_system(n=16, seed=321, device=device, dtype=wp.float32)
-    M = preconditioner(A, "diag")
-
-    _check_linear_solve(test, A, b, bicgstab, maxiter=1000)
-    _check_linear_solve(test, A, b, bicgstab, M=M, maxiter=1000)
-    _check_linear_solve(test, A, b, bicgstab, M=M, maxiter=1000, is_left_preconditioner=True)
+def test_bicgstab(test, device):
+    systems = _build_systems(
+        device,
+        (
+            (_make_nonsymmetric_system, dict(n=64, seed=123, dtype=wp.float64)),
+            (_make_nonsymmetric_system, dict(n=16, seed=321, dtype=wp.float32)),
+            (_make_indefinite_system, dict(n=64, seed=121, dtype=wp.float64)),
+        ),
+    )
 
-    A, b = _make_indefinite_system(n=64, seed=121, device=device, dtype=wp.float64)
-    M = preconditioner(A, "diag")
+    for A, b in systems:
+        M = preconditioner(A, "diag")
 
-    _check_linear_solve(test, A, b, bicgstab, maxiter=1000)
-    _check_linear_solve(test, A, b, bicgstab, M=M, maxiter=1000)
-    _check_linear_solve(test, A, b, bicgstab, M=M, maxiter=1000, is_left_preconditioner=True)
+        _check_linear_solve(test, A, b, bicgstab, maxiter=1000)
+        _check_linear_solve(test, A, b, bicgstab, M=M, maxiter=1000)
+        _check_linear_solve(test, A, b, bicgstab, M=M, maxiter=1000, is_left_preconditioner=True)
 
 
 def test_gmres(test, device):
-    A, b = _make_nonsymmetric_system(n=64, seed=456, device=device, dtype=wp.float64)
-    M = preconditioner(A, "diag")
-
-    _check_linear_solve(test, A, b, gmres, maxiter=1000, tol=1.0e-3)
-    _check_linear_solve(test, A, b, gmres, M=M, maxiter=1000, tol=1.0e-5)
-    _check_linear_solve(test, A, b, gmres, M=M, maxiter=1000, tol=1.0e-5, is_left_preconditioner=True)
-
-    A, b = _make_nonsymmetric_system(n=64, seed=654, device=device, dtype=wp.float64)
-    M = preconditioner(A, "diag")
-
-    _check_linear_solve(test, A, b, gmres, maxiter=1000, tol=1.0e-3)
-    _check_linear_solve(test, A, b, gmres, M=M, maxiter=1000, tol=1.0e-5)
-    _check_linear_solve(test, A, b, gmres, M=M, maxiter=1000, tol=1.0e-5, is_left_preconditioner=True)
+    systems = _build_systems(
+        device,
+        (
+            (_make_nonsymmetric_system, dict(n=64, seed=456, dtype=wp.float64)),
+            (_make_nonsymmetric_system, dict(n=64, seed=654, dtype=wp.float64)),
+        ),
+    )
+
+    for A, b in systems:
+        M = preconditioner(A, "diag")
+
+        _check_linear_solve(test, A, b, gmres, maxiter=1000, tol=1.0e-3)
+        _check_linear_solve(test, A, b, gmres, M=M, maxiter=1000, tol=1.0e-5)
+        _check_linear_solve(test, A, b, gmres, M=M, maxiter=1000, tol=1.0e-5, is_left_preconditioner=True)
 
 
 class TestLinearSolvers(unittest.TestCase):